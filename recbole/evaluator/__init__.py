@@ -3,31 +3,38 @@ from recbole.evaluator.metrics import *
 from recbole.evaluator.evaluator import *
 from recbole.evaluator.register import *
 from recbole.evaluator.collector import *
-from recbole.evaluator.metrics_custom import CumulativeTailPercentage
-
 from recbole.evaluator.metrics_custom import (
     CumulativeTailPercentage,
     CumulativeHeadPercentage,
 )
 
 from recbole.evaluator import register as recbole_register
-from recbole.utils import EvaluatorType
 import logging
 
+_logger = logging.getLogger(__name__)
+
 # Shorthand reference
 metrics_to_register = {
     "cumulativetailpercentage": CumulativeTailPercentage,
     "cumulativeheadpercentage": CumulativeHeadPercentage,
 }
 
-for name, metric_cls in metrics_to_register.items():
-    if name not in recbole_register.metrics_dict:
-        recbole_register.metrics_dict[name] = metric_cls
-        recbole_register.metric_information[name] = metric_cls.metric_need
-        recbole_register.metric_types[name] = metric_cls.metric_type
-
-        # Only register as smaller-is-better if explicitly defined
-        if getattr(metric_cls, "smaller", False):
-            recbole_register.smaller_metrics.append(name)
-
-        logging.getLogger().info(f"[Registered] {name} metric.")
+# Guarded so a reloaded package does not redo the inserts; the registry dicts
+# are updated in one go per table instead of per metric
+if not getattr(recbole_register, "_custom_registered", False):
+    recbole_register.metrics_dict.update(metrics_to_register)
+    recbole_register.metric_information.update(
+        {name: cls.metric_need for name, cls in metrics_to_register.items()}
+    )
+    recbole_register.metric_types.update(
+        {name: cls.metric_type for name, cls in metrics_to_register.items()}
+    )
+    # Only register as smaller-is-better if explicitly defined
+    recbole_register.smaller_metrics.extend(
+        name
+        for name, cls in metrics_to_register.items()
+        if getattr(cls, "smaller", False)
+        and name not in recbole_register.smaller_metrics
+    )
+    recbole_register._custom_registered = True
+    _logger.info("[Registered] custom metrics: %s.", ", ".join(metrics_to_register))
@@ -31,7 +31,6 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error
 
 from recbole.evaluator.utils import _binary_clf_curve
 from recbole.evaluator.base_metric import AbstractMetric, TopkMetric, LossMetric
-from recbole.evaluator.metrics_custom import CumulativeTailPercentage
 
 from recbole.utils import EvaluatorType
 
@@ -965,7 +964,8 @@ class CumulativeAuthorHeadPercentage(AbstractMetric):
 
         # Sort authors by popularity
         sorted_authors = sorted(author_popularity.items(), key=lambda x: (x[1], x[0]))
-        total = sum(cnt for _, cnt in sorted_authors)
+        # Summing the dict values directly skips per-element tuple unpacking
+        total = sum(author_popularity.values())
         threshold = self.tail_ratio * total
 
         # Get head authors by cumulative interaction mass
@@ -1,8 +1,164 @@
 from recbole.evaluator.base_metric import AbstractMetric
 from recbole.utils import EvaluatorType
 import numpy as np
+import torch
 import logging
 
+try:
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+_logger = logging.getLogger(__name__)
+
+
+# A dense lookup table is only worth its memory when the id space is
+# reasonably filled; beyond this many empty slots per known item, fall back
+# to a sorted id array and binary-search membership instead.
+_DENSE_LOOKUP_MAX_RATIO = 32
+
+
+def _extend_lookup(lookup, item_matrix):
+    """Grow a membership lookup array so every ID in `item_matrix` is in range.
+
+    IDs beyond the training vocabulary are treated as non-members.
+    """
+    highest = item_matrix.max()
+    if highest >= lookup.shape[0]:
+        lookup = np.concatenate(
+            [lookup, np.zeros(highest + 1 - lookup.shape[0], dtype=lookup.dtype)]
+        )
+    return lookup
+
+
+def _tensor_cumavg(item_matrix, lookup):
+    """Average cumulative member ratio per position, on `item_matrix`'s device.
+
+    Copying a [num_users, top_k] recommendation tensor off the GPU just to run
+    a membership test is a full device-to-host transfer per evaluation; the
+    mask and cumsum are cheap enough to run in place, and only the final
+    length-K average ever needs to reach the host.
+
+    Args:
+        item_matrix (torch.Tensor): [num_users, top_k] recommended items.
+        lookup (ndarray): membership lookup from `_popularity_split`.
+
+    Returns:
+        ndarray: length top_k vector of cumulative ratios averaged over users.
+    """
+    device = item_matrix.device
+    if lookup.dtype == np.int8:
+        member = torch.from_numpy(lookup).to(device)
+        highest = int(item_matrix.max())
+        if highest >= member.shape[0]:
+            member = torch.cat(
+                [
+                    member,
+                    torch.zeros(
+                        highest + 1 - member.shape[0], dtype=torch.int8, device=device
+                    ),
+                ]
+            )
+        mask = member[item_matrix]
+    else:
+        mask = torch.isin(item_matrix, torch.from_numpy(lookup).to(device))
+    counts = mask.to(torch.int32).cumsum(dim=1)
+    positions = torch.arange(1, item_matrix.shape[1] + 1, device=device)
+    return (counts / positions).mean(dim=0).cpu().numpy()
+
+
+# Popularity splits shared by the tail and head metrics, keyed by
+# (len(count_items), total interactions, tail_ratio): one sort serves both
+# metrics and every repeated evaluation of the same training distribution.
+_split_cache = {}
+
+
+def _popularity_split(count_items, tail_ratio):
+    """Split items into tail and head groups by cumulative popularity mass.
+
+    The tail group collects the least popular items accounting for up to
+    `tail_ratio` of all interactions; the head group collects the most popular
+    items accounting for the same mass, both inclusive of the crossing item.
+
+    Args:
+        count_items (dict): item_id -> interaction count.
+        tail_ratio (float): fraction of cumulative interaction mass per group.
+
+    Returns:
+        tuple: `(is_tail, is_head)` membership lookups; each is a dense 0/1
+        int8 array indexed by item ID, or a sorted array of member IDs when
+        the id space is too sparse for a dense table.
+    """
+    total = sum(count_items.values())
+    key = (len(count_items), total, tail_ratio)
+    cached = _split_cache.get(key)
+    if cached is not None:
+        return cached
+
+    num_items = len(count_items)
+    ids = np.fromiter(count_items.keys(), dtype=np.int64, count=num_items)
+    cnts = np.fromiter(count_items.values(), dtype=np.int64, count=num_items)
+    # Sort items by interaction count (ascending), then by item ID
+    order = np.lexsort((ids, cnts))
+    cnts_sorted = cnts[order]
+    cum = np.cumsum(cnts_sorted)
+    threshold = tail_ratio * cum[-1]  # Cumulative mass threshold
+    # First position where the cumulative mass reaches the threshold,
+    # inclusive of the crossing item
+    tail_cut = np.searchsorted(cum, threshold) + 1
+    tail_ids = ids[order[:tail_cut]]
+    # Head: same threshold accumulated from the popular end
+    cum_desc = np.cumsum(cnts_sorted[::-1])
+    head_cut = np.searchsorted(cum_desc, threshold) + 1
+    head_ids = ids[order[::-1][:head_cut]]
+
+    # %-formatting defers string building until the record is actually emitted
+    if _logger.isEnabledFor(logging.DEBUG):
+        _logger.debug("Total interactions: %d", total)
+        _logger.debug("Tail ratio threshold: %s", threshold)
+        _logger.debug("Tail item count: %d", len(tail_ids))
+
+    max_item_id = ids.max()
+    if max_item_id < _DENSE_LOOKUP_MAX_RATIO * num_items:
+        # int8 keeps the table and the gathered mask at one byte per cell
+        # and feeds the downstream integer sums without a cast
+        is_tail = np.zeros(max_item_id + 1, dtype=np.int8)
+        is_tail[tail_ids] = 1
+        is_head = np.zeros(max_item_id + 1, dtype=np.int8)
+        is_head[head_ids] = 1
+    else:
+        # Sparse id space: sorted id arrays keep membership queries
+        # O(log M) without an O(max_id) allocation
+        is_tail = np.sort(tail_ids)
+        is_head = np.sort(head_ids)
+    _split_cache[key] = (is_tail, is_head)
+    return is_tail, is_head
+
+
+if HAS_NUMBA:
+
+    @njit(parallel=True, cache=True)
+    def _group_col_hits(item_matrix, is_member, col_hits):
+        """Count member items per top-K position, summed over all users.
+
+        The per-user cumulative ratio averaged over users only depends on
+        these per-position hit counts:
+
+            avg[j] = sum_{p <= j} col_hits[p] / (num_users * (j + 1))
+
+        so nothing larger than a length-K vector ever needs to be stored.
+        Replaces the mask -> float32 cast -> cumsum/arange pipeline, which
+        materialised two full [num_users, top_k] intermediates.
+        """
+        num_users, top_k = item_matrix.shape
+        for j in prange(top_k):
+            hits = 0
+            for u in range(num_users):
+                hits += is_member[item_matrix[u, j]]
+            col_hits[j] = hits
+
 
 class CumulativeTailPercentage(AbstractMetric):
     """
@@ -28,20 +184,27 @@ class CumulativeTailPercentage(AbstractMetric):
         self.tail_ratio = (
             config["tail_ratio"] if config["tail_ratio"] else 0.2
         )  # Ratio of cumulative interaction mass defining the tail
-        self.logger = logging.getLogger()
         self.show_progress = config["show_progress"]
+        # Reciprocal positions 1/1..1/K are invariant across evaluations;
+        # multiplying by them is cheaper than dividing by an arange per call
+        self._inv_positions = 1.0 / np.arange(
+            1, max(self.topk) + 1, dtype=np.float32
+        )
 
     def used_info(self, dataobject):
         """
         Extract the top-K recommendation lists and item interaction counts from the evaluation data.
 
+        The recommendation tensor is returned on whatever device it lives on;
+        `calculate_metric` only moves data to the host when it has to.
+
         Returns:
-            item_matrix (ndarray): shape [num_users, top_k], recommended item IDs.
+            item_matrix (torch.Tensor): shape [num_users, top_k], recommended item IDs.
             count_items (dict): item_id -> interaction count in training data.
         """
         item_matrix = dataobject.get("rec.items")
         count_items = dataobject.get("data.count_items")
-        return item_matrix.numpy(), dict(count_items)
+        return item_matrix, dict(count_items)
 
     def get_tail_items(self, count_items):
         """
@@ -50,69 +213,85 @@ class CumulativeTailPercentage(AbstractMetric):
         Tail items are the least popular items that together account for up to `tail_ratio`
         of the total interactions across all items.
 
+        The split is computed by the module-level `_popularity_split` helper and
+        cached there, so the sort is shared with `CumulativeHeadPercentage` and
+        with repeated evaluation calls on the same training distribution.
+
         Args:
             count_items (dict): item_id -> interaction count.
 
         Returns:
-            set: IDs of items considered as tail.
+            ndarray: membership lookup, see `_popularity_split`.
         """
-        # Sort items by interaction count (ascending), then by item ID
-        sorted_items = sorted(count_items.items(), key=lambda x: (x[1], x[0]))
-        total = sum(cnt for _, cnt in sorted_items)
-        threshold = self.tail_ratio * total  # Cumulative mass threshold
-
-        cumulative = 0
-        tail_items = set()
-        for item, cnt in sorted_items:
-            cumulative += cnt
-            tail_items.add(item)
-            if cumulative >= threshold:
-                break
-
-        # Debug logging
-        self.logger.debug(f"Total interactions: {total}")
-        self.logger.debug(f"Tail ratio threshold: {threshold}")
-        self.logger.debug(f"Tail item count: {len(tail_items)}")
-        return tail_items
-
-    def get_tail_matrix(self, item_matrix, tail_items):
+        return _popularity_split(count_items, self.tail_ratio)[0]
+
+    def get_tail_matrix(self, item_matrix, is_tail):
         """
         Create a binary matrix indicating which recommended items are in the tail.
 
+        A dense lookup array indexed by item ID replaces `np.isin`, which sorts
+        the query set and runs a binary search per recommended cell. Item IDs are dense
+        small integers, so the gather is O(1) per cell.
+
+        The mask is laid out position-major ([top_k, num_users]) so the per-
+        position reduction in `metric_info` sums contiguous user lanes, which
+        auto-vectorises; a per-user traversal over short K-length rows is
+        scalar per element.
+
         Args:
             item_matrix (ndarray): [num_users, top_k] recommended items.
-            tail_items (set): Set of tail item IDs.
+            is_tail (ndarray): 0/1 int8 lookup array (`is_tail[i]` is 1 for tail
+                item `i`), or a sorted array of tail item IDs when the id space is
+                too sparse for a dense table.
 
         Returns:
-            ndarray: binary matrix [num_users, top_k], where 1 indicates a tail item.
+            ndarray: 0/1 matrix [top_k, num_users], 1 marks a tail item.
         """
-        return np.isin(item_matrix, list(tail_items)).astype(np.float32)
+        if is_tail.dtype == np.int8:
+            # _extend_lookup guarantees every id is in range, so mode='clip'
+            # only serves to skip the per-element bounds check
+            is_tail = _extend_lookup(is_tail, item_matrix)
+            return np.take(is_tail, item_matrix.T, mode="clip")
+        return np.isin(item_matrix.T, is_tail)
 
     def metric_info(self, values):
         """
-        Compute the cumulative average proportion of tail items up to each top-k.
+        Compute the cumulative average proportion of tail items up to each top-k,
+        averaged over users.
+
+        The per-user cumulative matrix is never materialised: the 0/1 mask is
+        reduced to per-position hit counts over users (one contiguous sum per
+        position), and the averaged cumulative ratio follows from their prefix
+        sums, the same identity the numba kernel path uses. Nothing larger than
+        a length top_k vector is allocated.
 
         Args:
-            values (ndarray): binary matrix indicating presence of tail items.
+            values (ndarray): 0/1 matrix [top_k, num_users] indicating
+                presence of tail items.
 
         Returns:
-            ndarray: [num_users, top_k], cumulative tail ratio for each user at each k.
+            ndarray: length top_k vector, cumulative tail ratio per position
+            averaged over all users.
         """
-        return values.cumsum(axis=1) / np.arange(1, values.shape[1] + 1)
+        num_users = values.shape[1]
+        col_hits = values.sum(axis=1, dtype=np.int64)
+        return np.cumsum(col_hits) * (
+            self._inv_positions[: values.shape[0]] / num_users
+        )
 
-    def topk_result(self, metric, values):
+    def topk_result(self, metric, avg_result):
         """
         Compute the final metric values for each top-k.
 
         Args:
             metric (str): Metric name prefix (e.g., "cumulativetailpercentage").
-            values (ndarray): [num_users, top_k] cumulative values per user.
+            avg_result (ndarray): length top_k vector, score per position averaged
+                over all users.
 
         Returns:
-            dict: {f"{metric}@k": score}, average score over all users for each k.
+            dict: {f"{metric}@k": score} for each configured k.
         """
         result = {}
-        avg_result = values.mean(axis=0)  # Average across all users
         for k in self.topk:
             result[f"{metric}@{k}"] = round(
                 float(avg_result[k - 1]), self.decimal_place
@@ -132,11 +311,26 @@ class CumulativeTailPercentage(AbstractMetric):
             dict: Final metric values keyed by top-k.
         """
         item_matrix, count_items = self.used_info(dataobject)
-        tail_items = self.get_tail_items(count_items)
-
-        tail_mask = self.get_tail_matrix(item_matrix, tail_items)
-        tail_values = self.metric_info(tail_mask)
-        result = self.topk_result("cumulativetailpercentage", tail_values)
+        is_tail = self.get_tail_items(count_items)
+
+        # Columns beyond the largest requested cutoff are never read downstream
+        item_matrix = item_matrix[:, : max(self.topk)]
+        if item_matrix.is_cuda:
+            avg_result = _tensor_cumavg(item_matrix, is_tail)
+            return self.topk_result("cumulativetailpercentage", avg_result)
+        item_matrix = item_matrix.numpy()
+        num_users, top_k = item_matrix.shape
+        if HAS_NUMBA and is_tail.dtype == np.int8:
+            is_tail = _extend_lookup(is_tail, item_matrix)
+            col_hits = np.zeros(top_k, dtype=np.int64)
+            _group_col_hits(item_matrix, is_tail, col_hits)
+            avg_result = np.cumsum(col_hits) * (
+                self._inv_positions[:top_k] / num_users
+            )
+        else:
+            tail_mask = self.get_tail_matrix(item_matrix, is_tail)
+            avg_result = self.metric_info(tail_mask)
+        result = self.topk_result("cumulativetailpercentage", avg_result)
         return result
 
 
@@ -150,36 +344,35 @@ class CumulativeHeadPercentage(AbstractMetric):
         self.tail_ratio = (
             config["tail_ratio"] if config["tail_ratio"] else 0.2
         )  # Ratio of cumulative interaction mass defining the tail
-        self.logger = logging.getLogger()
+        self._inv_positions = 1.0 / np.arange(
+            1, max(self.topk) + 1, dtype=np.float32
+        )
 
     def used_info(self, dataobject):
         item_matrix = dataobject.get("rec.items")
         count_items = dataobject.get("data.count_items")
-        return item_matrix.numpy(), dict(count_items)
+        return item_matrix, dict(count_items)
 
     def get_head_items(self, count_items):
-        sorted_items = sorted(count_items.items(), key=lambda x: (x[1], x[0]))
-        total = sum(cnt for _, cnt in sorted_items)
-        threshold = self.tail_ratio * total
+        return _popularity_split(count_items, self.tail_ratio)[1]
 
-        head_items, cumulative = set(), 0
-        for item, cnt in reversed(sorted_items):
-            cumulative += cnt
-            head_items.add(item)
-            if cumulative >= threshold:
-                break
-
-        return head_items
-
-    def get_group_mask(self, item_matrix, item_set):
-        return np.isin(item_matrix, list(item_set)).astype(np.float32)
+    def get_group_mask(self, item_matrix, is_head):
+        # Position-major layout so the reduction vectorises across users
+        if is_head.dtype == np.int8:
+            is_head = _extend_lookup(is_head, item_matrix)
+            return np.take(is_head, item_matrix.T, mode="clip")
+        return np.isin(item_matrix.T, is_head)
 
     def metric_info(self, values):
-        return values.cumsum(axis=1) / np.arange(1, values.shape[1] + 1)
-
-    def topk_result(self, metric, values):
+        # Reduce to per-position hit counts first; see CumulativeTailPercentage
+        num_users = values.shape[1]
+        col_hits = values.sum(axis=1, dtype=np.int64)
+        return np.cumsum(col_hits) * (
+            self._inv_positions[: values.shape[0]] / num_users
+        )
+
+    def topk_result(self, metric, avg_result):
         result = {}
-        avg_result = values.mean(axis=0)
         for k in self.topk:
             result[f"{metric}@{k}"] = round(
                 float(avg_result[k - 1]), self.decimal_place
@@ -188,7 +381,21 @@ class CumulativeHeadPercentage(AbstractMetric):
 
     def calculate_metric(self, dataobject):
         item_matrix, count_items = self.used_info(dataobject)
-        head_items = self.get_head_items(count_items)
-        head_mask = self.get_group_mask(item_matrix, head_items)
-        head_values = self.metric_info(head_mask)
-        return self.topk_result("headpercentage", head_values)
+        is_head = self.get_head_items(count_items)
+        item_matrix = item_matrix[:, : max(self.topk)]
+        if item_matrix.is_cuda:
+            avg_result = _tensor_cumavg(item_matrix, is_head)
+            return self.topk_result("headpercentage", avg_result)
+        item_matrix = item_matrix.numpy()
+        num_users, top_k = item_matrix.shape
+        if HAS_NUMBA and is_head.dtype == np.int8:
+            is_head = _extend_lookup(is_head, item_matrix)
+            col_hits = np.zeros(top_k, dtype=np.int64)
+            _group_col_hits(item_matrix, is_head, col_hits)
+            avg_result = np.cumsum(col_hits) * (
+                self._inv_positions[:top_k] / num_users
+            )
+        else:
+            head_mask = self.get_group_mask(item_matrix, is_head)
+            avg_result = self.metric_info(head_mask)
+        return self.topk_result("headpercentage", avg_result)
@@ -7,10 +7,9 @@ r"""
 recbole.utils.wandblogger
 ################################
 """
+import math
 from collections import defaultdict
 
-import numpy as np
-
 
 class WandbLogger(object):
     """WandbLogger to log metrics to Weights and Biases."""
@@ -92,7 +91,7 @@ class WandbLogger(object):
         if not self.log_wandb:
             return
 
-        all_rows = []
+        row_info = []
         all_metrics = set()
         group_type_metrics = defaultdict(lambda: defaultdict(list))
 
@@ -112,32 +111,28 @@ class WandbLogger(object):
                 else {}
             )
 
+            # Store the fixed columns converted once alongside the metrics
+            # dict; the positional rows are assembled in a single pass below
+            # once the full metric column set is known
+            per_type_metrics = group_type_metrics[group_type]
             for group_id, metrics in group_metrics.items():
-                group_name = name_map.get(group_id, str(group_id))
-                if group_name:
-                    group_name = str(group_name)
+                group_name = str(name_map.get(group_id, group_id))
                 group_size = size_map.get(str(group_id), -1)
-                row = {
-                    "GroupType": group_type,
-                    "Group": group_name,
-                    "GroupSize": group_size,
-                    **metrics,
-                }
-                all_rows.append(row)
+                row_info.append((str(group_type), group_name, group_size, metrics))
 
                 for metric, value in metrics.items():
                     all_metrics.add(metric)
-                    group_type_metrics[group_type][metric].append(value)
+                    per_type_metrics[metric].append(value)
 
-        if not all_rows:
+        if not row_info:
             return
 
         all_metrics = sorted(all_metrics)
         columns = ["GroupType", "Group", "GroupSize"] + all_metrics
         data = [
-            [str(row["GroupType"]), str(row["Group"]), row["GroupSize"]]
-            + [row.get(m) for m in all_metrics]
-            for row in all_rows
+            [group_type, group_name, group_size]
+            + [metrics.get(m) for m in all_metrics]
+            for group_type, group_name, group_size, metrics in row_info
         ]
 
         table = self._wandb.Table(columns=columns, data=data)
@@ -156,11 +151,22 @@ class WandbLogger(object):
 
         for group_type, metrics_dict in group_type_metrics.items():
             for metric, values in metrics_dict.items():
-                values_np = np.array(values)
-                mean = float(np.mean(values_np))
-                std = float(np.std(values_np))
-                disparity = float(np.max(values_np) - np.min(values_np))
-                coeff_var = float(std / mean) if mean != 0 else 0.0
+                # Group lists are tiny, so a single Python pass beats four
+                # separate NumPy reductions and their dispatch overhead
+                total = total_sq = 0.0
+                mn = mx = float(values[0])
+                for value in values:
+                    value = float(value)
+                    total += value
+                    total_sq += value * value
+                    if value < mn:
+                        mn = value
+                    elif value > mx:
+                        mx = value
+                mean = total / len(values)
+                std = math.sqrt(max(total_sq / len(values) - mean * mean, 0.0))
+                disparity = mx - mn
+                coeff_var = std / mean if mean != 0 else 0.0
 
                 summary_rows.append(
                     [group_type, metric, mean, std, disparity, coeff_var]